@@ -0,0 +1,166 @@
+"""Compare join_requests row size and expiry-scan speed before and after the
+migration from ISO text timestamps to integer epoch columns.
+
+Run from the repository root:
+
+    python -m benchmarks.timestamp_storage [rows]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from utils.database import Database
+
+LEGACY_CHANNELS_SCHEMA = '''
+CREATE TABLE channels (
+    channel_id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    welcome_message TEXT,
+    approval_message TEXT,
+    approval_timeout INTEGER DEFAULT 24,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+)
+'''
+
+LEGACY_SCHEMA = '''
+CREATE TABLE join_requests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel_id INTEGER,
+    user_id INTEGER,
+    requested_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME,
+    approved_at DATETIME,
+    rejected_at DATETIME
+)
+'''
+
+LEGACY_EXPIRY_SCAN = '''
+SELECT jr.*, c.title as channel_title
+FROM join_requests jr
+JOIN channels c ON jr.channel_id = c.channel_id
+WHERE jr.approved_at IS NULL
+AND jr.rejected_at IS NULL
+AND jr.expires_at < ?
+'''
+
+# Database.get_expired_requests after the migration
+EPOCH_EXPIRY_SCAN = '''
+SELECT jr.*, c.title as channel_title
+FROM join_requests jr
+JOIN channels c ON jr.bot_id = c.bot_id AND jr.channel_id = c.channel_id
+WHERE jr.approved_at IS NULL
+AND jr.rejected_at IS NULL
+AND jr.expires_at < ?
+AND jr.bot_id = ?
+'''
+
+SCAN_REPEATS = 20
+
+def build_legacy_database(path, rows):
+    """Create a database in the pre-migration layout, filled with join requests."""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute(LEGACY_CHANNELS_SCHEMA)
+    cursor.execute(LEGACY_SCHEMA)
+    cursor.executemany(
+        "INSERT INTO channels (channel_id, title) VALUES (?, ?)",
+        [(-1000000000000 - i, f"Channel {i}") for i in range(10)]
+    )
+
+    rng = random.Random(42)
+    start = datetime.now() - timedelta(days=30)
+    batch = []
+    for _ in range(rows):
+        requested_at = start + timedelta(seconds=rng.randrange(30 * 86400))
+        expires_at = requested_at + timedelta(hours=24)
+        outcome = rng.random()
+        approved_at = (requested_at + timedelta(minutes=5)).isoformat() if outcome < 0.6 else None
+        rejected_at = expires_at.isoformat() if 0.6 <= outcome < 0.9 else None
+        batch.append((
+            -1000000000000 - rng.randrange(10),
+            rng.randrange(10**9, 7 * 10**9),
+            requested_at.isoformat(),
+            expires_at.isoformat(),
+            approved_at,
+            rejected_at,
+        ))
+    cursor.executemany(
+        """
+        INSERT INTO join_requests
+        (channel_id, user_id, requested_at, expires_at, approved_at, rejected_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        batch
+    )
+    conn.commit()
+    conn.close()
+
+def table_bytes_per_row(path, rows):
+    """Average bytes of table and index pages per join request row."""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("VACUUM")
+    try:
+        cursor.execute(
+            """
+            SELECT SUM(pgsize) FROM dbstat
+            WHERE name = 'join_requests'
+            OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'join_requests' AND type = 'index')
+            """
+        )
+        total = cursor.fetchone()[0]
+    except sqlite3.OperationalError:
+        # SQLite built without dbstat; fall back to the whole file
+        total = os.path.getsize(path)
+    conn.close()
+    return total / rows
+
+def time_scan(path, query, params):
+    """Best wall-clock time of the expiry scan, in milliseconds."""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    best = float("inf")
+    for _ in range(SCAN_REPEATS):
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        matched = len(cursor.fetchall())
+        best = min(best, time.perf_counter() - started)
+    cursor.execute("EXPLAIN QUERY PLAN " + query, params)
+    plan = "; ".join(row[-1] for row in cursor.fetchall())
+    conn.close()
+    return best * 1000, matched, plan
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_legacy_database(path, rows)
+
+        # Scan from the middle of the range so roughly half the pending rows match
+        cutoff = datetime.now() - timedelta(days=15)
+        before_size = table_bytes_per_row(path, rows)
+        before_ms, before_matched, before_plan = time_scan(path, LEGACY_EXPIRY_SCAN, (cutoff.isoformat(),))
+
+        started = time.perf_counter()
+        Database(path)
+        migration_s = time.perf_counter() - started
+
+        after_size = table_bytes_per_row(path, rows)
+        after_ms, after_matched, after_plan = time_scan(path, EPOCH_EXPIRY_SCAN, (int(cutoff.timestamp()), 0))
+
+    print(f"join_requests rows: {rows}")
+    print(f"migration time: {migration_s:.2f} s")
+    print(f"{'':24}{'before':>12}{'after':>12}")
+    print(f"{'bytes/row (incl. idx)':24}{before_size:12.1f}{after_size:12.1f}")
+    print(f"{'expiry scan (ms)':24}{before_ms:12.2f}{after_ms:12.2f}")
+    print(f"{'rows matched':24}{before_matched:12}{after_matched:12}")
+    print(f"plan before: {before_plan}")
+    print(f"plan after:  {after_plan}")
+
+if __name__ == "__main__":
+    main()
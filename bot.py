@@ -1,6 +1,10 @@
+import asyncio
+import json
 import logging
 import os
+import signal
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, NetworkError, RetryAfter
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -12,6 +16,15 @@ from telegram.ext import (
 )
 from utils.database import Database
 from utils.messages import Messages
+from utils.media import MediaSender, SEND_METHODS, guess_media_type, message_file_id
+from utils.broadcast import Broadcaster
+from utils.admission import (
+    AdmissionController,
+    CircuitBreaker,
+    Deferred,
+    PRIORITY_CALLBACK,
+    PRIORITY_JOIN_REQUEST,
+)
 import config
 
 # Enable logging
@@ -20,11 +33,15 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize database
-db = Database()
+# Initialize database; every bot gets a namespaced view sharing its connection pool and caches
+database = Database(config.DATABASE_PATH, pool_size=config.DATABASE_POOL_SIZE)
 
-# Initialize messages handler
-msg = Messages(db)
+# Initialize admission control for the join-request pipeline, shared by all bots
+admission = AdmissionController(
+    config.MAX_IN_FLIGHT,
+    config.CALLBACK_RESERVED_SLOTS,
+    config.MAX_WAITING_JOIN_REQUESTS,
+)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send a message when the command /start is issued."""
@@ -43,7 +60,11 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         "/setup_channel - Set up a channel for management\n"
         "/set_welcome - Set a welcome message for a channel\n"
         "/set_approval - Set approval message\n"
-        "/stats - Show channel statistics"
+        "/set_media - Attach an image or video to the welcome or approval message\n"
+        "/stats - Show channel statistics\n"
+        "/broadcast - Message everyone approved into a channel\n"
+        "/broadcast_status - Show progress of recent broadcasts\n"
+        "/load - Show load and shedding counters"
     )
     await update.message.reply_text(help_text)
 
@@ -73,7 +94,8 @@ async def setup_channel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             return
             
         # Save channel to database
-        db.add_channel(chat.id, chat.title, update.effective_user.id)
+        context.bot_data["db"].add_channel(chat.id, chat.title, update.effective_user.id)
+        context.bot_data["media"].invalidate(chat.id)
         
         await update.message.reply_text(
             f"Successfully set up channel: {chat.title}\n"
@@ -106,7 +128,7 @@ async def set_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     
     try:
         chat = await context.bot.get_chat(channel_id)
-        db.set_welcome_message(chat.id, welcome_message)
+        context.bot_data["db"].set_welcome_message(chat.id, welcome_message)
         
         await update.message.reply_text(
             f"Welcome message for {chat.title} has been set to:\n\n{welcome_message}\n\n"
@@ -135,7 +157,7 @@ async def set_approval(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     
     try:
         chat = await context.bot.get_chat(channel_id)
-        db.set_approval_message(chat.id, approval_message)
+        context.bot_data["db"].set_approval_message(chat.id, approval_message)
         
         await update.message.reply_text(
             f"Approval message for {chat.title} has been set to:\n\n{approval_message}\n\n"
@@ -147,11 +169,149 @@ async def set_approval(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     except Exception as e:
         await update.message.reply_text(f"Error: {str(e)}")
 
+async def set_media(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Attach a photo, video or animation to a channel's welcome or approval message."""
+    if not await is_admin(update, context):
+        return
+    
+    if not context.args or len(context.args) < 2 or context.args[1] not in ("welcome", "approval"):
+        await update.message.reply_text(
+            "Please provide a channel ID, the message to attach media to and the media.\n"
+            "Reply to a photo, video or GIF with:\n"
+            "/set_media @yourchannel welcome\n"
+            "Or give a link:\n"
+            "/set_media @yourchannel approval https://example.com/banner.jpg\n"
+            "Use 'none' instead of a link to remove the media."
+        )
+        return
+    
+    channel_id = context.args[0]
+    kind = context.args[1]
+    source = context.args[2] if len(context.args) > 2 else None
+    db = context.bot_data["db"]
+    media = context.bot_data["media"]
+    replied = update.message.reply_to_message
+    
+    try:
+        chat = await context.bot.get_chat(channel_id)
+        
+        if source == "none":
+            db.set_channel_media(chat.id, kind, None, None, None)
+            media.invalidate(chat.id)
+            await update.message.reply_text(f"Removed the {kind} media for {chat.title}.")
+            return
+        
+        if source:
+            # Only links; Telegram would upload any other string that names a file on this server
+            if not source.startswith(("http://", "https://")):
+                await update.message.reply_text("Please give an http:// or https:// link, or reply to the media.")
+                return
+            
+            # Upload once as a preview to validate the link and get a file_id
+            media_type = guess_media_type(source)
+            send = getattr(context.bot, SEND_METHODS[media_type])
+            preview = await context.bot_data["breaker"].call(
+                send, update.effective_chat.id, source, caption="Preview"
+            )
+            file_id = message_file_id(preview, media_type)
+        else:
+            media_type = next(
+                (media_type for media_type in SEND_METHODS if replied and getattr(replied, media_type)),
+                None
+            )
+            if media_type is None:
+                await update.message.reply_text("Reply to a photo, video or GIF, or provide a link.")
+                return
+            
+            # The media is already on Telegram, so its file_id is enough to send it
+            file_id = message_file_id(replied, media_type)
+            
+            # Keep a local copy for re-uploads when possible; the Bot API
+            # won't serve files over 20 MB, so this is best-effort
+            try:
+                telegram_file = await context.bot.get_file(file_id)
+                extension = os.path.splitext(telegram_file.file_path or "")[1]
+                source = media.local_path(chat.id, kind, extension)
+                os.makedirs(os.path.dirname(source), exist_ok=True)
+                await telegram_file.download_to_drive(source)
+            except Exception as e:
+                logger.warning(f"Could not keep a local copy of the {kind} media for {chat.id}: {e}")
+                source = None
+        
+        db.set_channel_media(chat.id, kind, media_type, source, file_id)
+        media.invalidate(chat.id)
+        
+        await update.message.reply_text(f"The {kind} message for {chat.title} will now include this {media_type}.")
+    except Exception as e:
+        await update.message.reply_text(f"Error: {str(e)}")
+
+async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Start a broadcast to every member approved into a channel."""
+    if not await is_admin(update, context):
+        return
+    
+    if not context.args or len(context.args) < 2:
+        await update.message.reply_text(
+            "Please provide a channel ID and the message to send.\n"
+            "Example: /broadcast @yourchannel Our live stream starts in 10 minutes!"
+        )
+        return
+    
+    channel_id = context.args[0]
+    text = " ".join(context.args[1:])
+    db = context.bot_data["db"]
+    
+    try:
+        chat = await context.bot.get_chat(channel_id)
+        admin_channels = db.get_admin_channels(update.effective_user.id)
+        if chat.id not in [channel['channel_id'] for channel in admin_channels]:
+            await update.message.reply_text("You can only broadcast to channels you have set up.")
+            return
+        
+        job_id = db.create_broadcast_job(chat.id, update.effective_chat.id, text)
+        if job_id is None:
+            await update.message.reply_text("Failed to create the broadcast.")
+            return
+        
+        job = db.get_broadcast_job(job_id)
+        context.bot_data["broadcaster"].start(context.application, job)
+        
+        await update.message.reply_text(
+            f"Broadcast #{job_id} to {job['total']} members of {chat.title} has started.\n"
+            f"Use /broadcast_status {job_id} to check on it."
+        )
+    except Exception as e:
+        await update.message.reply_text(f"Error: {str(e)}")
+
+async def broadcast_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show progress of one broadcast, or of the most recent ones."""
+    if not await is_admin(update, context):
+        return
+    
+    db = context.bot_data["db"]
+    broadcaster = context.bot_data["broadcaster"]
+    
+    if context.args:
+        try:
+            job = db.get_broadcast_job(int(context.args[0]))
+        except ValueError:
+            job = None
+        jobs = [job] if job else []
+    else:
+        jobs = db.get_broadcast_jobs()
+    
+    if not jobs:
+        await update.message.reply_text("No broadcasts found.")
+        return
+    
+    await update.message.reply_text("\n\n".join(broadcaster.format_progress(job) for job in jobs))
+
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show statistics about managed channels."""
     if not await is_admin(update, context):
         return
-        
+    
+    db = context.bot_data["db"]
     channels = db.get_admin_channels(update.effective_user.id)
     
     if not channels:
@@ -167,16 +327,60 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     
     await update.message.reply_text(stats_text)
 
+async def load(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show in-flight work, queued work and shedding counters."""
+    if not await is_admin(update, context):
+        return
+    
+    db = context.bot_data["db"]
+    snapshot = admission.snapshot(context.bot_data["breaker"])
+    load_text = (
+        "Load:\n\n"
+        f"• In flight: {snapshot['in_flight']}/{snapshot['max_in_flight']}\n"
+        f"• Waiting callbacks: {snapshot['waiting_callbacks']}\n"
+        f"• Waiting join requests: {snapshot['waiting_join_requests']}\n"
+        f"• Deferred join requests: {db.get_deferred_count()}\n"
+        f"• Circuit breaker: {'open' if snapshot['breaker_open'] else 'closed'}\n"
+    )
+    
+    if snapshot['counters']:
+        load_text += "\nCounters:\n"
+        for name, value in sorted(snapshot['counters'].items()):
+            load_text += f"  - {name}: {value}\n"
+    
+    await update.message.reply_text(load_text)
+
 async def handle_chat_join_request(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle join requests for channels."""
-    join_request = update.chat_join_request
+    try:
+        async with admission.slot(PRIORITY_JOIN_REQUEST, context.bot_data["breaker"]):
+            handled = await process_join_request(update.chat_join_request, context.bot, context.bot_data)
+    except Deferred:
+        # Shed under load; the drain task replays it once there is room
+        context.bot_data["db"].defer_update("chat_join_request", update.to_json())
+        return
+    
+    if not handled:
+        # Telegram is slow or rate limiting us; replay it later instead of dropping it
+        context.bot_data["db"].defer_update("chat_join_request", update.to_json())
+        admission.counters["deferred_transient"] += 1
+
+async def process_join_request(join_request, bot, bot_data) -> bool:
+    """Send the approval message for a join request.
+
+    Returns False if sending failed for a transient reason (network errors or
+    rate limiting) and the join request should be tried again later.
+    """
+    db, msg, breaker = bot_data["db"], bot_data["msg"], bot_data["breaker"]
     user = join_request.from_user
     chat = join_request.chat
     
     # Check if channel is in our database
     channel_info = db.get_channel(chat.id)
     if not channel_info:
-        return
+        return True
+    
+    media = bot_data["media"]
     
     # Create approval message with button
     approval_message = msg.format_approval_message(channel_info, user)
@@ -187,20 +391,73 @@ async def handle_chat_join_request(update: Update, context: ContextTypes.DEFAULT
     
     # Send approval message to the user
     try:
-        await context.bot.send_message(
-            chat_id=user.id,
-            text=approval_message,
-            reply_markup=reply_markup
-        )
+        await media.send(bot, user.id, channel_info, "approval", approval_message, reply_markup)
         # Log the request
         db.log_join_request(chat.id, user.id)
+    except BadRequest as e:
+        # Telegram rejected the message itself; retrying won't help
+        logger.error(f"Failed to send approval message: {e}")
+    except (RetryAfter, NetworkError) as e:
+        logger.error(f"Failed to send approval message: {e}")
+        return False
     except Exception as e:
         logger.error(f"Failed to send approval message: {e}")
+    
+    return True
+
+async def drain_deferred_join_requests(application: Application) -> None:
+    """Replay deferred join requests whenever there is spare capacity."""
+    db, breaker = application.bot_data["db"], application.bot_data["breaker"]
+    while True:
+        await asyncio.sleep(config.DEFERRED_DRAIN_INTERVAL)
+        
+        try:
+            # Keep replaying while there is room rather than one batch per tick
+            while not breaker.is_open:
+                free = min(admission.free_slots(PRIORITY_JOIN_REQUEST), config.DEFERRED_DRAIN_BATCH)
+                if free == 0:
+                    break
+                
+                rows = db.get_deferred_updates("chat_join_request", free)
+                if not rows:
+                    break
+                
+                handled = await asyncio.gather(*(replay_join_request(application, row) for row in rows))
+                if not all(handled):
+                    # Overloaded or Telegram is still struggling; try again next tick
+                    break
+        except Exception as e:
+            logger.error(f"Failed to replay deferred join requests: {e}")
+
+async def replay_join_request(application: Application, row) -> bool:
+    """Replay one deferred join request in its own slot, removing it once handled."""
+    update = Update.de_json(json.loads(row['payload']), application.bot)
+    try:
+        async with admission.slot(PRIORITY_JOIN_REQUEST, application.bot_data["breaker"]):
+            handled = await process_join_request(
+                update.chat_join_request, application.bot, application.bot_data
+            )
+    except Deferred:
+        return False
+    
+    if not handled:
+        admission.counters["replay_failed_join_request"] += 1
+        return False
+    
+    application.bot_data["db"].delete_deferred_update(row['id'])
+    admission.counters["replayed_join_request"] += 1
+    return True
 
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle button callbacks."""
-    query = update.callback_query
-    await query.answer()
+    async with admission.slot(PRIORITY_CALLBACK):
+        await process_callback(update.callback_query, context.bot, context.bot_data)
+
+async def process_callback(query, bot, bot_data) -> None:
+    """Approve the join request behind an approval button."""
+    db, msg, breaker = bot_data["db"], bot_data["msg"], bot_data["breaker"]
+    media = bot_data["media"]
+    await breaker.call(query.answer)
     
     data = query.data.split(':')
     if data[0] == "approve":
@@ -209,7 +466,8 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         # Approve the join request
         try:
-            await context.bot.approve_chat_join_request(
+            await breaker.call(
+                bot.approve_chat_join_request,
                 chat_id=chat_id,
                 user_id=user_id
             )
@@ -219,28 +477,32 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             
             # Send welcome message in the channel
             channel_info = db.get_channel(chat_id)
-            user = await context.bot.get_chat_member(chat_id=chat_id, user_id=user_id)
+            user = await breaker.call(bot.get_chat_member, chat_id=chat_id, user_id=user_id)
             
             # Format and send welcome message if set
-            if channel_info and channel_info.get('welcome_message'):
+            if channel_info and (channel_info.get('welcome_message') or channel_info.get('welcome_media_type')):
                 welcome_text = msg.format_welcome_message(channel_info, user.user)
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=welcome_text
-                )
+                await media.send(bot, chat_id, channel_info, "welcome", welcome_text)
             
             # Update the approval button message
-            await query.edit_message_text(
-                text=f"✅ You have been approved to join the channel!\n\nWelcome to the community!"
+            await edit_approval_message(
+                query, breaker,
+                f"✅ You have been approved to join the channel!\n\nWelcome to the community!"
             )
         except Exception as e:
-            await query.edit_message_text(
-                text=f"❌ Failed to approve your request: {str(e)}"
-            )
+            await edit_approval_message(query, breaker, f"❌ Failed to approve your request: {str(e)}")
+
+async def edit_approval_message(query, breaker, text) -> None:
+    """Replace the approval button message, which may be a media caption."""
+    if query.message and query.message.text is None:
+        await breaker.call(query.edit_message_caption, caption=text)
+    else:
+        await breaker.call(query.edit_message_text, text=text)
 
 async def is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     """Check if the user is an admin for any registered channel."""
     user_id = update.effective_user.id
+    db = context.bot_data["db"]
     
     # Check if user is in the admins list
     if db.is_admin(user_id):
@@ -255,10 +517,49 @@ async def is_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
     await update.message.reply_text("You don't have permission to use this command.")
     return False
 
-def main() -> None:
-    """Start the bot."""
-    # Create the Application and pass it your bot's token
-    application = Application.builder().token(config.BOT_TOKEN).build()
+async def start_background_tasks(application: Application) -> None:
+    """Start background tasks once the bot is running, so the application tracks them."""
+    application.bot_data["drain_task"] = application.create_task(drain_deferred_join_requests(application))
+    application.bot_data["broadcaster"].resume_all(application)
+
+async def stop_background_tasks(application: Application) -> None:
+    """Cancel background tasks so stopping the bot doesn't wait for them to finish."""
+    drain_task = application.bot_data.get("drain_task")
+    if drain_task:
+        drain_task.cancel()
+    await application.bot_data["broadcaster"].stop()
+
+def build_application(token: str) -> Application:
+    """Create the Application for one bot token with its own namespaced storage."""
+    # The numeric bot id is the part of the token before the colon
+    bot_id = int(token.split(":")[0])
+    
+    # Updates are handled concurrently so the admission controller decides
+    # what runs and what waits.
+    application = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(True)
+        .build()
+    )
+    
+    bot_db = database.for_bot(bot_id)
+    application.bot_data["db"] = bot_db
+    application.bot_data["msg"] = Messages(bot_db)
+    application.bot_data["breaker"] = CircuitBreaker(
+        config.CIRCUIT_BREAKER_THRESHOLD, config.CIRCUIT_BREAKER_COOLDOWN
+    )
+    application.bot_data["media"] = MediaSender(bot_db, application.bot_data["breaker"], config.MEDIA_DIR)
+    # Broadcasts get their own breaker, so a rate limit hit by bulk sends
+    # doesn't defer join requests or stall button callbacks
+    application.bot_data["broadcaster"] = Broadcaster(
+        bot_db,
+        CircuitBreaker(config.CIRCUIT_BREAKER_THRESHOLD, config.CIRCUIT_BREAKER_COOLDOWN),
+        config.BROADCAST_RATE,
+        config.BROADCAST_WORKERS,
+        config.BROADCAST_PAGE_SIZE,
+        config.BROADCAST_REPORT_INTERVAL,
+    )
 
     # Command handlers
     application.add_handler(CommandHandler("start", start))
@@ -266,16 +567,61 @@ def main() -> None:
     application.add_handler(CommandHandler("setup_channel", setup_channel))
     application.add_handler(CommandHandler("set_welcome", set_welcome))
     application.add_handler(CommandHandler("set_approval", set_approval))
+    application.add_handler(CommandHandler("set_media", set_media))
     application.add_handler(CommandHandler("stats", stats))
+    application.add_handler(CommandHandler("broadcast", broadcast))
+    application.add_handler(CommandHandler("broadcast_status", broadcast_status))
+    application.add_handler(CommandHandler("load", load))
     
     # Chat join request handler - using ChatJoinRequestHandler instead of MessageHandler with filters
     application.add_handler(ChatJoinRequestHandler(handle_chat_join_request))
     
     # Callback query handler
     application.add_handler(CallbackQueryHandler(handle_callback))
+    
+    return application
 
-    # Run the bot until the user presses Ctrl-C
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+async def run_applications(applications) -> None:
+    """Run one or more bots on one event loop until interrupted."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass  # Signal handlers are unavailable on Windows event loops
+    
+    initialized = []
+    try:
+        for application in applications:
+            await application.initialize()
+            initialized.append(application)
+            await application.start()
+            await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+            await start_background_tasks(application)
+            logger.info(f"Started bot @{application.bot.username}")
+        
+        await stop.wait()
+    finally:
+        # Stop every bot that got far enough to start, even if a later one failed
+        for application in reversed(initialized):
+            # Application.stop() waits for its tasks, so cancel long-running ones first
+            await stop_background_tasks(application)
+            if application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+            await application.shutdown()
+
+def main() -> None:
+    """Start the bot."""
+    applications = [build_application(token) for token in config.BOT_TOKENS]
+    
+    # Rows stored before multi-bot support belong to the first bot
+    applications[0].bot_data["db"].adopt_legacy_rows()
+    
+    # Run the bots until the user presses Ctrl-C
+    asyncio.run(run_applications(applications))
 
 if __name__ == "__main__":
     main()
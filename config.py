@@ -7,6 +7,18 @@ load_dotenv()
 # Telegram Bot Token
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
+# Comma-separated tokens to run several bots in one process
+BOT_TOKENS = [token.strip() for token in os.getenv('BOT_TOKENS', '').split(',') if token.strip()]
+if not BOT_TOKENS and BOT_TOKEN:
+    BOT_TOKENS = [BOT_TOKEN]
+
+# Database settings
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'telegram_bot.db')
+DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', 4))  # Connections shared by all bots
+
+# Local copies of template media, kept so it can be re-uploaded if Telegram forgets a file_id
+MEDIA_DIR = os.getenv('MEDIA_DIR', 'media')
+
 # Default messages
 DEFAULT_WELCOME_MESSAGE = "Welcome {name} to {channel}! We're glad to have you here."
 DEFAULT_APPROVAL_MESSAGE = "Hello {name}! To join {channel}, please click the approval button below. You have {timeout} hours to approve your request."
@@ -14,6 +26,23 @@ DEFAULT_APPROVAL_MESSAGE = "Hello {name}! To join {channel}, please click the ap
 # Default settings
 DEFAULT_APPROVAL_TIMEOUT = 24  # 24 hours
 
+# Admission control
+MAX_IN_FLIGHT = int(os.getenv('MAX_IN_FLIGHT', 32))  # Handlers allowed to run at once
+CALLBACK_RESERVED_SLOTS = int(os.getenv('CALLBACK_RESERVED_SLOTS', 8))  # Slots only button callbacks may use
+MAX_WAITING_JOIN_REQUESTS = int(os.getenv('MAX_WAITING_JOIN_REQUESTS', 64))  # Beyond this the oldest are deferred
+DEFERRED_DRAIN_INTERVAL = 5  # Seconds between checks for deferred join requests to replay
+DEFERRED_DRAIN_BATCH = 20  # Most deferred join requests replayed at once
+
+# Circuit breaker for outbound Telegram calls
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_THRESHOLD', 5))  # Consecutive errors before opening
+CIRCUIT_BREAKER_COOLDOWN = int(os.getenv('CIRCUIT_BREAKER_COOLDOWN', 30))  # Seconds to pause once open
+
+# Broadcasts to approved members
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', 25))  # Messages per second per bot; leave room under Telegram's ~30/s for approval messages
+BROADCAST_WORKERS = 8  # Concurrent senders per broadcast
+BROADCAST_PAGE_SIZE = 500  # Recipients read from the database at a time
+BROADCAST_REPORT_INTERVAL = 15  # Seconds between progress updates to the admin
+
 # Check if required environment variables are set
-if not BOT_TOKEN:
-    raise ValueError("BOT_TOKEN environment variable is not set. Please set it in .env file or in your environment.")
+if not BOT_TOKENS:
+    raise ValueError("BOT_TOKEN or BOT_TOKENS environment variable is not set. Please set it in .env file or in your environment.")
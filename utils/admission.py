@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Lower value wins when slots free up
+PRIORITY_CALLBACK = 0
+PRIORITY_JOIN_REQUEST = 1
+
+
+class Deferred(Exception):
+    """Raised when work is shed and should be moved to the durable queue."""
+
+
+class CircuitBreaker:
+    def __init__(self, threshold, cooldown):
+        """Pause outbound Telegram calls after repeated failures."""
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_until = 0.0
+        self.counters = Counter()
+
+    @property
+    def is_open(self):
+        """Whether outbound calls are currently paused."""
+        return time.monotonic() < self.opened_until
+
+    def record_success(self):
+        """Reset the failure streak after a successful call."""
+        self.failures = 0
+
+    def record_failure(self, retry_after=None):
+        """Count a failed call and open the breaker when the threshold is hit."""
+        self.failures += 1
+        self.counters["telegram_errors"] += 1
+        if retry_after is None and self.failures < self.threshold:
+            return
+
+        pause = max(self.cooldown, retry_after or 0)
+        self.opened_until = time.monotonic() + pause
+        self.failures = 0
+        self.counters["breaker_opened"] += 1
+        logger.warning(f"Circuit breaker opened, pausing Telegram calls for {pause} seconds")
+
+    async def call(self, func, *args, **kwargs):
+        """Run an outbound Telegram call, waiting first if the breaker is open."""
+        remaining = self.opened_until - time.monotonic()
+        if remaining > 0:
+            self.counters["calls_paused"] += 1
+            await asyncio.sleep(remaining)
+
+        try:
+            result = await func(*args, **kwargs)
+        except BadRequest:
+            # Telegram answered, so the connection itself is healthy
+            self.record_success()
+            raise
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if hasattr(retry_after, "total_seconds"):
+                retry_after = retry_after.total_seconds()
+            self.record_failure(retry_after=retry_after)
+            raise
+        except NetworkError:
+            self.record_failure()
+            raise
+
+        self.record_success()
+        return result
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight, callback_reserved, max_waiting_join_requests):
+        """Bound in-flight handler work, favouring callbacks over join requests.
+
+        One controller can be shared by several bots, so the in-flight budget
+        is for the whole process. Circuit breakers stay per bot.
+        """
+        self.max_in_flight = max_in_flight
+        self.callback_reserved = min(callback_reserved, max_in_flight - 1)
+        self.max_waiting_join_requests = max_waiting_join_requests
+        self.in_flight = 0
+        self.counters = Counter()
+        self._waiting = {
+            PRIORITY_CALLBACK: deque(),
+            PRIORITY_JOIN_REQUEST: deque(),
+        }
+
+    def free_slots(self, priority):
+        """Number of slots work of the given priority could take right now."""
+        if priority == PRIORITY_CALLBACK:
+            limit = self.max_in_flight
+        else:
+            limit = self.max_in_flight - self.callback_reserved
+        return max(limit - self.in_flight, 0)
+
+    def has_capacity(self, priority):
+        """Check whether work of the given priority could start right now."""
+        return self.free_slots(priority) > 0
+
+    def waiting(self, priority):
+        """Number of handlers queued for a slot at the given priority."""
+        return len(self._waiting[priority])
+
+    def _can_start(self, priority):
+        # Waiters at the same or a higher priority go first
+        for queued_priority, queue in self._waiting.items():
+            if queued_priority <= priority and queue:
+                return False
+        return self.has_capacity(priority)
+
+    async def acquire(self, priority, breaker=None):
+        """Wait for an in-flight slot, raising Deferred if the work is shed."""
+        if priority == PRIORITY_JOIN_REQUEST and breaker is not None and breaker.is_open:
+            self.counters["deferred_breaker_open"] += 1
+            raise Deferred()
+
+        if self._can_start(priority):
+            self.in_flight += 1
+            self.counters[f"admitted_{_priority_name(priority)}"] += 1
+            return
+
+        queue = self._waiting[priority]
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self.counters[f"queued_{_priority_name(priority)}"] += 1
+
+        # Only join requests are shed; users pressing buttons always wait
+        if priority == PRIORITY_JOIN_REQUEST:
+            self._shed_oldest(queue)
+
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # The slot was handed over just before cancellation
+                self.release()
+            elif waiter in queue:
+                queue.remove(waiter)
+            raise
+
+        self.counters[f"admitted_{_priority_name(priority)}"] += 1
+
+    def _shed_oldest(self, queue):
+        # Waiters cancelled but not yet cleaned up are dropped without counting
+        while len(queue) > self.max_waiting_join_requests:
+            oldest = queue.popleft()
+            if oldest.done():
+                continue
+            oldest.set_exception(Deferred())
+            self.counters["deferred_overload"] += 1
+
+    def release(self):
+        """Free a slot and hand it to the highest-priority waiter."""
+        self.in_flight -= 1
+        for priority, queue in self._waiting.items():
+            while queue and self.has_capacity(priority):
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority, breaker=None):
+        """Hold an in-flight slot for the duration of the block."""
+        await self.acquire(priority, breaker)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self, breaker=None):
+        """Current load and all shedding counters, for reporting."""
+        counters = Counter(self.counters)
+        if breaker is not None:
+            counters.update(breaker.counters)
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting_callbacks": self.waiting(PRIORITY_CALLBACK),
+            "waiting_join_requests": self.waiting(PRIORITY_JOIN_REQUEST),
+            "breaker_open": breaker is not None and breaker.is_open,
+            "counters": dict(counters),
+        }
+
+
+def _priority_name(priority):
+    return "callback" if priority == PRIORITY_CALLBACK else "join_request"
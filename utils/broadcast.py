@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import time
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Attempts per recipient before a delivery is recorded as failed
+MAX_ATTEMPTS = 3
+
+
+class RateLimiter:
+    def __init__(self, rate):
+        """Space out calls so no more than `rate` start per second."""
+        self.interval = 1 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        """Wait until the next call is allowed."""
+        async with self._lock:
+            now = time.monotonic()
+            if self._next_slot > now:
+                await asyncio.sleep(self._next_slot - now)
+                now = self._next_slot
+            self._next_slot = now + self.interval
+
+
+class Broadcaster:
+    def __init__(self, db, breaker, rate, workers, page_size, report_interval):
+        """Run persistent broadcast jobs for one bot."""
+        self.db = db
+        self.breaker = breaker
+        self.limiter = RateLimiter(rate)  # Shared by all jobs of this bot
+        self.workers = workers
+        self.page_size = page_size
+        self.report_interval = report_interval
+        self._tasks = {}  # job_id -> asyncio.Task created through the application
+
+    def is_running(self, job_id):
+        """Whether a job is being delivered by this process."""
+        task = self._tasks.get(job_id)
+        return task is not None and not task.done()
+
+    def start(self, application, job):
+        """Start or resume delivering a job in the background."""
+        if self.is_running(job['id']):
+            return
+        self._tasks[job['id']] = application.create_task(self.run(application.bot, job))
+
+    def resume_all(self, application):
+        """Resume every job that was still running when the bot stopped."""
+        for job in self.db.get_broadcast_jobs(status="running", limit=100):
+            logger.info(f"Resuming broadcast {job['id']}")
+            self.start(application, job)
+
+    async def stop(self):
+        """Cancel running jobs; they stay 'running' and resume on the next start."""
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, bot, job):
+        """Deliver a job to every approved member it has not reached yet."""
+        queue = asyncio.Queue(maxsize=self.page_size * 2)
+        progress = {"started": time.monotonic(), "processed": 0}
+        producer = asyncio.create_task(self._produce(job, queue))
+        tasks = [producer] + [
+            asyncio.create_task(self._worker(bot, job, queue, progress))
+            for _ in range(self.workers)
+        ]
+        reporter = asyncio.create_task(self._report(bot, job['id'], progress))
+
+        try:
+            # Watch the producer and the workers together, so a failing task
+            # fails the job instead of leaving the others blocked on the queue
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        raise task.exception()
+            self.db.finish_broadcast_job(job['id'])
+        except Exception as e:
+            logger.error(f"Broadcast {job['id']} failed: {e}")
+            self.db.finish_broadcast_job(job['id'], "failed")
+        finally:
+            # On cancellation the job stays 'running' and resumes on the next start
+            for task in tasks:
+                task.cancel()
+            reporter.cancel()
+            await self._send_progress(bot, job['id'], progress)
+
+    async def _produce(self, job, queue):
+        # Recipients queued before a restart but never attempted
+        after_user_id = 0
+        while True:
+            user_ids = self.db.get_pending_deliveries(job['id'], after_user_id, self.page_size)
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                await queue.put(user_id)
+            after_user_id = user_ids[-1]
+
+        # Then the rest of the channel, one page at a time
+        cursor_user_id = job['cursor_user_id']
+        while True:
+            user_ids = self.db.claim_broadcast_page(
+                job['id'], job['channel_id'], cursor_user_id, self.page_size
+            )
+            if not user_ids:
+                break
+            for user_id in user_ids:
+                await queue.put(user_id)
+            cursor_user_id = user_ids[-1]
+
+        for _ in range(self.workers):
+            await queue.put(None)
+
+    async def _worker(self, bot, job, queue, progress):
+        while True:
+            user_id = await queue.get()
+            if user_id is None:
+                return
+            status, error = await self._deliver(bot, job['text'], user_id)
+            self.db.record_delivery(job['id'], user_id, status, error)
+            progress["processed"] += 1
+
+    async def _deliver(self, bot, text, user_id):
+        error = None
+        for attempt in range(MAX_ATTEMPTS):
+            await self.limiter.wait()
+            try:
+                await self.breaker.call(bot.send_message, chat_id=user_id, text=text)
+                return "sent", None
+            except (Forbidden, BadRequest) as e:
+                # Blocked the bot, deleted account or similar; retrying won't help
+                return "failed", str(e)
+            except RetryAfter as e:
+                # The breaker is now open and holds off the next attempt
+                error = e
+            except NetworkError as e:
+                error = e
+                await asyncio.sleep(2 ** attempt)
+            except TelegramError as e:
+                # ChatMigrated and other API errors for this recipient
+                return "failed", str(e)
+            except Exception as e:
+                logger.error(f"Unexpected error sending broadcast to {user_id}: {e}")
+                return "failed", str(e)
+        return "failed", str(error)
+
+    async def _report(self, bot, job_id, progress):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            await self._send_progress(bot, job_id, progress)
+
+    async def _send_progress(self, bot, job_id, progress):
+        # One status message per run, edited in place as the job advances
+        job = self.db.get_broadcast_job(job_id)
+        if not job:
+            return
+        text = self.format_progress(job, progress)
+        try:
+            if progress.get("message"):
+                await self.breaker.call(progress["message"].edit_text, text)
+            else:
+                progress["message"] = await self.breaker.call(
+                    bot.send_message, chat_id=job['admin_chat_id'], text=text
+                )
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                logger.warning(f"Failed to report progress of broadcast {job_id}: {e}")
+        except Exception as e:
+            logger.warning(f"Failed to report progress of broadcast {job_id}: {e}")
+
+    def format_progress(self, job, progress=None):
+        """Describe a job's progress and, while running here, its throughput."""
+        done = job['sent'] + job['failed']
+        text = (
+            f"📣 Broadcast #{job['id']} ({job['status']})\n"
+            f"Delivered: {job['sent']}\n"
+            f"Failed: {job['failed']}\n"
+            f"Progress: {done}/{job['total']}"
+        )
+        if progress and progress["processed"]:
+            elapsed = time.monotonic() - progress["started"]
+            rate = progress["processed"] / elapsed if elapsed > 0 else 0
+            text += f"\nThroughput: {rate:.1f} messages/s"
+            remaining = job['total'] - done
+            if job['status'] == "running" and rate > 0 and remaining > 0:
+                text += f"\nEstimated time left: {int(remaining / rate // 60)} minutes"
+        return text
@@ -1,30 +1,149 @@
 import sqlite3
 import os
 import logging
-from datetime import datetime, timedelta
+import threading
+import time
+
+# Every table is namespaced by the id of the bot that owns the row. Rows
+# written before multi-bot support have bot_id 0 until a bot adopts them.
+CHANNELS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    bot_id INTEGER NOT NULL DEFAULT 0,
+    channel_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    welcome_message TEXT,
+    approval_message TEXT,
+    approval_timeout INTEGER DEFAULT 24,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    welcome_media_type TEXT,
+    welcome_media_source TEXT,
+    welcome_media_file_id TEXT,
+    approval_media_type TEXT,
+    approval_media_source TEXT,
+    approval_media_file_id TEXT,
+    PRIMARY KEY (bot_id, channel_id)
+)
+'''
+
+ADMINS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    bot_id INTEGER NOT NULL DEFAULT 0,
+    user_id INTEGER NOT NULL,
+    added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (bot_id, user_id)
+)
+'''
+
+CHANNEL_ADMINS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    bot_id INTEGER NOT NULL DEFAULT 0,
+    channel_id INTEGER,
+    user_id INTEGER,
+    PRIMARY KEY (bot_id, channel_id, user_id),
+    FOREIGN KEY (bot_id, channel_id) REFERENCES channels(bot_id, channel_id),
+    FOREIGN KEY (bot_id, user_id) REFERENCES admins(bot_id, user_id)
+)
+'''
+
+# Channel templates that can carry a photo, video or animation. For each kind
+# the channels table has {kind}_media_type, {kind}_media_source (a local path
+# or URL to re-upload from) and {kind}_media_file_id (Telegram's id for reuse).
+MEDIA_KINDS = ("welcome", "approval")
+
+# Join request timestamps are stored as integer seconds since the epoch (UTC)
+JOIN_REQUESTS_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bot_id INTEGER NOT NULL DEFAULT 0,
+    channel_id INTEGER,
+    user_id INTEGER,
+    requested_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+    expires_at INTEGER,
+    approved_at INTEGER,
+    rejected_at INTEGER,
+    FOREIGN KEY (bot_id, channel_id) REFERENCES channels(bot_id, channel_id)
+)
+'''
+
+# Rows copied per transaction while migrating join_requests
+MIGRATION_BATCH_SIZE = 5000
+
+def utc_now():
+    """Current time as integer seconds since the epoch (UTC)."""
+    return int(time.time())
+
+def _epoch_from_text(column):
+    """SQL expression converting a legacy text timestamp column to epoch seconds.
+
+    Values written by the bot came from datetime.now().isoformat() and are in
+    local time, while CURRENT_TIMESTAMP defaults are already UTC.
+    """
+    return (
+        f"CASE WHEN {column} IS NULL THEN NULL "
+        f"WHEN typeof({column}) = 'integer' THEN {column} "
+        f"WHEN instr({column}, 'T') > 0 THEN CAST(strftime('%s', {column}, 'utc') AS INTEGER) "
+        f"ELSE CAST(strftime('%s', {column}) AS INTEGER) END"
+    )
+
+def _columns(cursor, table):
+    """Names of the columns of a table."""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+class ConnectionPool:
+    def __init__(self, db_path, size=4):
+        """Keep a small set of SQLite connections open for reuse."""
+        self.db_path = db_path
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take an idle connection, opening a new one if none is free."""
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = None
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, closing it if the pool is full."""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
 
 class Database:
-    def __init__(self, db_path="telegram_bot.db"):
-        """Initialize database connection."""
+    def __init__(self, db_path="telegram_bot.db", bot_id=0, pool=None, pool_size=4, channel_cache=None):
+        """Initialize database connection.
+
+        Databases created with for_bot() share the connection pool and the
+        channel cache of the instance they came from.
+        """
         self.db_path = db_path
-        self._create_tables()
+        self.bot_id = bot_id
+        self._channel_cache = {} if channel_cache is None else channel_cache
+        if pool is None:
+            self._pool = ConnectionPool(db_path, pool_size)
+            self._create_tables()
+        else:
+            self._pool = pool
+
+    def for_bot(self, bot_id):
+        """Get a view of the database namespaced to a single bot."""
+        return Database(self.db_path, bot_id, pool=self._pool, channel_cache=self._channel_cache)
 
     def _create_tables(self):
         """Create database tables if they don't exist."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
         # Channels table - added approval_timeout field
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS channels (
-            channel_id INTEGER PRIMARY KEY,
-            title TEXT NOT NULL,
-            welcome_message TEXT,
-            approval_message TEXT,
-            approval_timeout INTEGER DEFAULT 24,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
+        cursor.execute(CHANNELS_SCHEMA.format(table="channels"))
         
         # Add approval_timeout column if it doesn't exist
         try:
@@ -33,37 +152,13 @@ class Database:
             cursor.execute("ALTER TABLE channels ADD COLUMN approval_timeout INTEGER DEFAULT 24")
         
         # Admins table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS admins (
-            user_id INTEGER PRIMARY KEY,
-            added_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
+        cursor.execute(ADMINS_SCHEMA.format(table="admins"))
         
         # Channel admins mapping
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS channel_admins (
-            channel_id INTEGER,
-            user_id INTEGER,
-            PRIMARY KEY (channel_id, user_id),
-            FOREIGN KEY (channel_id) REFERENCES channels(channel_id),
-            FOREIGN KEY (user_id) REFERENCES admins(user_id)
-        )
-        ''')
+        cursor.execute(CHANNEL_ADMINS_SCHEMA.format(table="channel_admins"))
         
         # Join requests tracking - added expires_at field
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS join_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            channel_id INTEGER,
-            user_id INTEGER,
-            requested_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            expires_at DATETIME,
-            approved_at DATETIME,
-            rejected_at DATETIME,
-            FOREIGN KEY (channel_id) REFERENCES channels(channel_id)
-        )
-        ''')
+        cursor.execute(JOIN_REQUESTS_SCHEMA.format(table="join_requests"))
         
         # Add expires_at column if it doesn't exist
         try:
@@ -76,52 +171,266 @@ class Database:
             cursor.execute("SELECT rejected_at FROM join_requests LIMIT 1")
         except sqlite3.OperationalError:
             cursor.execute("ALTER TABLE join_requests ADD COLUMN rejected_at DATETIME")
+        
+        conn.commit()
+        
+        # Convert legacy text timestamps to integer epoch columns
+        cursor.execute("PRAGMA table_info(join_requests)")
+        column_types = {row[1]: row[2].upper() for row in cursor.fetchall()}
+        if column_types.get('requested_at') != 'INTEGER':
+            self._migrate_join_request_timestamps(conn)
+        
+        # Durable queue for updates shed under load
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS deferred_updates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bot_id INTEGER NOT NULL DEFAULT 0,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            deferred_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+        ''')
+        conn.commit()
+        
+        # Namespace tables created before multi-bot support
+        if 'bot_id' not in _columns(cursor, "channels"):
+            self._migrate_bot_namespace(conn)
+        for table in ("join_requests", "deferred_updates"):
+            if 'bot_id' not in _columns(cursor, table):
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN bot_id INTEGER NOT NULL DEFAULT 0")
+        
+        # Add media template columns if they don't exist
+        channel_columns = _columns(cursor, "channels")
+        for kind in MEDIA_KINDS:
+            for suffix in ("media_type", "media_source", "media_file_id"):
+                if f"{kind}_{suffix}" not in channel_columns:
+                    cursor.execute(f"ALTER TABLE channels ADD COLUMN {kind}_{suffix} TEXT")
+        
+        # Indexes for the pending-expiry range scan and per-user lookups
+        cursor.execute("DROP INDEX IF EXISTS idx_join_requests_pending_expiry")
+        cursor.execute("DROP INDEX IF EXISTS idx_join_requests_channel_user")
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_join_requests_bot_pending_expiry
+        ON join_requests (bot_id, expires_at)
+        WHERE approved_at IS NULL AND rejected_at IS NULL
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_join_requests_bot_channel_user
+        ON join_requests (bot_id, channel_id, user_id)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_deferred_updates_bot_kind
+        ON deferred_updates (bot_id, kind, id)
+        ''')
+        
+        # Approved members of a channel, in user_id order for keyset pagination
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_join_requests_approved_members
+        ON join_requests (bot_id, channel_id, user_id)
+        WHERE approved_at IS NOT NULL
+        ''')
+        
+        # Broadcast jobs; cursor_user_id is the last recipient queued for delivery
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bot_id INTEGER NOT NULL,
+            channel_id INTEGER NOT NULL,
+            admin_chat_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            cursor_user_id INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+            finished_at INTEGER
+        )
+        ''')
+        
+        # Per-recipient delivery status, so a restarted job skips finished recipients
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            job_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            error TEXT,
+            attempted_at INTEGER,
+            PRIMARY KEY (job_id, user_id),
+            FOREIGN KEY (job_id) REFERENCES broadcast_jobs(id)
+        ) WITHOUT ROWID
+        ''')
             
         conn.commit()
-        conn.close()
+        self._pool.release(conn)
+
+    def _migrate_bot_namespace(self, conn):
+        """Rebuild the channel and admin tables with bot_id in their keys."""
+        cursor = conn.cursor()
+        rebuilds = [
+            ("channels", CHANNELS_SCHEMA,
+             "channel_id, title, welcome_message, approval_message, approval_timeout, created_at"),
+            ("admins", ADMINS_SCHEMA, "user_id, added_at"),
+            ("channel_admins", CHANNEL_ADMINS_SCHEMA, "channel_id, user_id"),
+        ]
+        
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for table, schema, columns in rebuilds:
+                cursor.execute(schema.format(table=f"{table}_ns"))
+                cursor.execute(f"INSERT INTO {table}_ns ({columns}) SELECT {columns} FROM {table}")
+                cursor.execute(f"DROP TABLE {table}")
+                cursor.execute(f"ALTER TABLE {table}_ns RENAME TO {table}")
+            conn.commit()
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            raise
+        
+        logging.info("Namespaced channel and admin tables by bot id")
+
+    def adopt_legacy_rows(self):
+        """Assign rows written before multi-bot support to this bot."""
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            for table in ("channels", "admins", "channel_admins", "join_requests", "deferred_updates"):
+                cursor.execute(
+                    f"UPDATE OR IGNORE {table} SET bot_id = ? WHERE bot_id = 0",
+                    (self.bot_id,)
+                )
+            conn.commit()
+            self._channel_cache.clear()
+            return True
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            return False
+        finally:
+            self._pool.release(conn)
+
+    def _migrate_join_request_timestamps(self, conn):
+        """Rewrite join_requests with integer epoch timestamps.
+
+        Rows are copied in short batches, so another process sharing the
+        database file (such as a bot instance that is still running) is only
+        blocked briefly. Triggers mirror its updates and deletes of rows that
+        were already copied, new rows are picked up by the final catch-up, and
+        an interrupted migration resumes from the last copied id.
+        """
+        cursor = conn.cursor()
+        copy_sql = f'''
+            INSERT INTO join_requests_epoch
+            (id, channel_id, user_id, requested_at, expires_at, approved_at, rejected_at)
+            SELECT id, channel_id, user_id,
+                   COALESCE({_epoch_from_text('requested_at')}, CAST(strftime('%s', 'now') AS INTEGER)),
+                   {_epoch_from_text('expires_at')},
+                   {_epoch_from_text('approved_at')},
+                   {_epoch_from_text('rejected_at')}
+            FROM join_requests
+            WHERE id > ?
+            ORDER BY id
+        '''
+        
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(JOIN_REQUESTS_SCHEMA.format(table="join_requests_epoch"))
+        
+        # Keep already-copied rows in step with writes made during the copy.
+        # The triggers are dropped together with the old table.
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS join_requests_epoch_sync_update
+        AFTER UPDATE ON join_requests
+        BEGIN
+            UPDATE join_requests_epoch SET
+                channel_id = NEW.channel_id,
+                user_id = NEW.user_id,
+                requested_at = COALESCE({_epoch_from_text('NEW.requested_at')}, requested_at),
+                expires_at = {_epoch_from_text('NEW.expires_at')},
+                approved_at = {_epoch_from_text('NEW.approved_at')},
+                rejected_at = {_epoch_from_text('NEW.rejected_at')}
+            WHERE id = NEW.id;
+        END
+        ''')
+        cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS join_requests_epoch_sync_delete
+        AFTER DELETE ON join_requests
+        BEGIN
+            DELETE FROM join_requests_epoch WHERE id = OLD.id;
+        END
+        ''')
+        conn.commit()
+        
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM join_requests_epoch")
+        last_id = cursor.fetchone()[0]
+        
+        while True:
+            cursor.execute(copy_sql + " LIMIT ?", (last_id, MIGRATION_BATCH_SIZE))
+            copied = cursor.rowcount
+            conn.commit()
+            if copied < MIGRATION_BATCH_SIZE:
+                break
+            cursor.execute("SELECT MAX(id) FROM join_requests_epoch")
+            last_id = cursor.fetchone()[0]
+        
+        # Copy rows written since the last batch and swap the tables atomically
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM join_requests_epoch")
+            cursor.execute(copy_sql, (cursor.fetchone()[0],))
+            cursor.execute("DROP TABLE join_requests")
+            cursor.execute("ALTER TABLE join_requests_epoch RENAME TO join_requests")
+            conn.commit()
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            raise
+        
+        logging.info("Migrated join_requests timestamps to integer epoch columns")
 
     def add_channel(self, channel_id, title, admin_id):
         """Add a new channel to the database."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
         try:
             # Add channel
             cursor.execute(
-                "INSERT OR REPLACE INTO channels (channel_id, title) VALUES (?, ?)",
-                (channel_id, title)
+                "INSERT OR REPLACE INTO channels (bot_id, channel_id, title) VALUES (?, ?, ?)",
+                (self.bot_id, channel_id, title)
             )
             
             # Make sure the admin exists
             cursor.execute(
-                "INSERT OR IGNORE INTO admins (user_id) VALUES (?)",
-                (admin_id,)
+                "INSERT OR IGNORE INTO admins (bot_id, user_id) VALUES (?, ?)",
+                (self.bot_id, admin_id)
             )
             
             # Associate admin with channel
             cursor.execute(
-                "INSERT OR IGNORE INTO channel_admins (channel_id, user_id) VALUES (?, ?)",
-                (channel_id, admin_id)
+                "INSERT OR IGNORE INTO channel_admins (bot_id, channel_id, user_id) VALUES (?, ?, ?)",
+                (self.bot_id, channel_id, admin_id)
             )
             
             conn.commit()
+            self._channel_cache.pop((self.bot_id, channel_id), None)
             return True
         except Exception as e:
             logging.error(f"Database error: {e}")
             conn.rollback()
             return False
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def add_admin(self, user_id):
         """Add a new admin to the database."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
         try:
             cursor.execute(
-                "INSERT OR IGNORE INTO admins (user_id) VALUES (?)",
-                (user_id,)
+                "INSERT OR IGNORE INTO admins (bot_id, user_id) VALUES (?, ?)",
+                (self.bot_id, user_id)
             )
             conn.commit()
             return True
@@ -130,149 +439,218 @@ class Database:
             conn.rollback()
             return False
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def is_admin(self, user_id):
         """Check if a user is an admin."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
-        cursor.execute(
-            "SELECT 1 FROM admins WHERE user_id = ?", 
-            (user_id,)
-        )
-        result = cursor.fetchone() is not None
-        conn.close()
+        try:
+            cursor.execute(
+                "SELECT 1 FROM admins WHERE bot_id = ? AND user_id = ?", 
+                (self.bot_id, user_id)
+            )
+            result = cursor.fetchone() is not None
+        finally:
+            self._pool.release(conn)
         
         return result
 
     def get_admins(self):
         """Get all admins."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT user_id FROM admins")
-        result = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        try:
+            cursor.execute("SELECT user_id FROM admins WHERE bot_id = ?", (self.bot_id,))
+            result = [row[0] for row in cursor.fetchall()]
+        finally:
+            self._pool.release(conn)
         
         return result
 
     def set_welcome_message(self, channel_id, message):
         """Set a welcome message for a channel."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
         try:
             cursor.execute(
-                "UPDATE channels SET welcome_message = ? WHERE channel_id = ?",
-                (message, channel_id)
+                "UPDATE channels SET welcome_message = ? WHERE bot_id = ? AND channel_id = ?",
+                (message, self.bot_id, channel_id)
             )
             conn.commit()
+            self._channel_cache.pop((self.bot_id, channel_id), None)
             return True
         except Exception as e:
             logging.error(f"Database error: {e}")
             conn.rollback()
             return False
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def set_approval_message(self, channel_id, message):
         """Set an approval message for a channel."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
         try:
             cursor.execute(
-                "UPDATE channels SET approval_message = ? WHERE channel_id = ?",
-                (message, channel_id)
+                "UPDATE channels SET approval_message = ? WHERE bot_id = ? AND channel_id = ?",
+                (message, self.bot_id, channel_id)
             )
             conn.commit()
+            self._channel_cache.pop((self.bot_id, channel_id), None)
             return True
         except Exception as e:
             logging.error(f"Database error: {e}")
             conn.rollback()
             return False
         finally:
-            conn.close()
+            self._pool.release(conn)
             
     def set_approval_timeout(self, channel_id, hours):
         """Set approval timeout in hours for a channel."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "UPDATE channels SET approval_timeout = ? WHERE bot_id = ? AND channel_id = ?",
+                (hours, self.bot_id, channel_id)
+            )
+            conn.commit()
+            self._channel_cache.pop((self.bot_id, channel_id), None)
+            return True
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            return False
+        finally:
+            self._pool.release(conn)
+
+    def set_channel_media(self, channel_id, kind, media_type, source, file_id):
+        """Attach media to a channel's welcome or approval message, or clear it with None."""
+        if kind not in MEDIA_KINDS:
+            raise ValueError(f"Unknown media kind: {kind}")
+        
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
         try:
             cursor.execute(
-                "UPDATE channels SET approval_timeout = ? WHERE channel_id = ?",
-                (hours, channel_id)
+                f"""
+                UPDATE channels
+                SET {kind}_media_type = ?, {kind}_media_source = ?, {kind}_media_file_id = ?
+                WHERE bot_id = ? AND channel_id = ?
+                """,
+                (media_type, source, file_id, self.bot_id, channel_id)
             )
             conn.commit()
+            self._channel_cache.pop((self.bot_id, channel_id), None)
+            return cursor.rowcount > 0
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            return False
+        finally:
+            self._pool.release(conn)
+
+    def set_media_file_id(self, channel_id, kind, file_id):
+        """Store the Telegram file_id returned after uploading a channel's media."""
+        if kind not in MEDIA_KINDS:
+            raise ValueError(f"Unknown media kind: {kind}")
+        
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                f"UPDATE channels SET {kind}_media_file_id = ? WHERE bot_id = ? AND channel_id = ?",
+                (file_id, self.bot_id, channel_id)
+            )
+            conn.commit()
+            self._channel_cache.pop((self.bot_id, channel_id), None)
             return True
         except Exception as e:
             logging.error(f"Database error: {e}")
             conn.rollback()
             return False
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def get_channel(self, channel_id):
         """Get channel info."""
-        conn = sqlite3.connect(self.db_path)
+        cached = self._channel_cache.get((self.bot_id, channel_id))
+        if cached is not None:
+            return dict(cached)
+        
+        conn = self._pool.acquire()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute(
-            "SELECT * FROM channels WHERE channel_id = ?",
-            (channel_id,)
-        )
-        result = cursor.fetchone()
-        conn.close()
+        try:
+            cursor.execute(
+                "SELECT * FROM channels WHERE bot_id = ? AND channel_id = ?",
+                (self.bot_id, channel_id)
+            )
+            result = cursor.fetchone()
+        finally:
+            self._pool.release(conn)
         
-        return dict(result) if result else None
+        if not result:
+            return None
+        
+        self._channel_cache[(self.bot_id, channel_id)] = dict(result)
+        return dict(result)
 
     def get_admin_channels(self, admin_id):
         """Get all channels administered by a user."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute(
-            """
-            SELECT c.* FROM channels c
-            JOIN channel_admins ca ON c.channel_id = ca.channel_id
-            WHERE ca.user_id = ?
-            """,
-            (admin_id,)
-        )
-        
-        result = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        try:
+            cursor.execute(
+                """
+                SELECT c.* FROM channels c
+                JOIN channel_admins ca ON c.bot_id = ca.bot_id AND c.channel_id = ca.channel_id
+                WHERE ca.bot_id = ? AND ca.user_id = ?
+                """,
+                (self.bot_id, admin_id)
+            )
+            
+            result = [dict(row) for row in cursor.fetchall()]
+        finally:
+            self._pool.release(conn)
         
         return result
 
     def log_join_request(self, channel_id, user_id):
         """Log a join request with expiration time based on channel settings."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
         try:
             # Get channel's approval timeout setting
             cursor.execute(
-                "SELECT approval_timeout FROM channels WHERE channel_id = ?",
-                (channel_id,)
+                "SELECT approval_timeout FROM channels WHERE bot_id = ? AND channel_id = ?",
+                (self.bot_id, channel_id)
             )
             timeout_hours = cursor.fetchone()[0] or 24  # Default to 24 hours
             
             # Calculate expiration time
-            now = datetime.now()
-            expires_at = now + timedelta(hours=timeout_hours)
+            now = utc_now()
+            expires_at = now + timeout_hours * 3600
             
             cursor.execute(
                 """
                 INSERT INTO join_requests 
-                (channel_id, user_id, requested_at, expires_at) 
-                VALUES (?, ?, ?, ?)
+                (bot_id, channel_id, user_id, requested_at, expires_at) 
+                VALUES (?, ?, ?, ?, ?)
                 """,
-                (channel_id, user_id, now.isoformat(), expires_at.isoformat())
+                (self.bot_id, channel_id, user_id, now, expires_at)
             )
             conn.commit()
             return True
@@ -281,25 +659,25 @@ class Database:
             conn.rollback()
             return False
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def approve_join_request(self, channel_id, user_id):
         """Mark a join request as approved."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
         try:
-            now = datetime.now().isoformat()
+            now = utc_now()
             cursor.execute(
                 """
                 UPDATE join_requests 
                 SET approved_at = ? 
-                WHERE channel_id = ? AND user_id = ? 
+                WHERE bot_id = ? AND channel_id = ? AND user_id = ? 
                 AND approved_at IS NULL 
                 AND (rejected_at IS NULL) 
                 AND (expires_at IS NULL OR expires_at > ?)
                 """,
-                (now, channel_id, user_id, now)
+                (now, self.bot_id, channel_id, user_id, now)
             )
             conn.commit()
             return cursor.rowcount > 0  # True if any row was updated
@@ -308,24 +686,24 @@ class Database:
             conn.rollback()
             return False
         finally:
-            conn.close()
+            self._pool.release(conn)
             
     def reject_join_request(self, channel_id, user_id):
         """Mark a join request as rejected (expired)."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
         try:
-            now = datetime.now().isoformat()
+            now = utc_now()
             cursor.execute(
                 """
                 UPDATE join_requests 
                 SET rejected_at = ? 
-                WHERE channel_id = ? AND user_id = ? 
+                WHERE bot_id = ? AND channel_id = ? AND user_id = ? 
                 AND approved_at IS NULL 
                 AND rejected_at IS NULL
                 """,
-                (now, channel_id, user_id)
+                (now, self.bot_id, channel_id, user_id)
             )
             conn.commit()
             return cursor.rowcount > 0  # True if any row was updated
@@ -334,66 +712,337 @@ class Database:
             conn.rollback()
             return False
         finally:
-            conn.close()
+            self._pool.release(conn)
 
     def get_expired_requests(self):
         """Get all expired join requests that haven't been handled yet."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        now = datetime.now().isoformat()
-        cursor.execute(
-            """
-            SELECT jr.*, c.title as channel_title
-            FROM join_requests jr
-            JOIN channels c ON jr.channel_id = c.channel_id
-            WHERE jr.approved_at IS NULL 
-            AND jr.rejected_at IS NULL
-            AND jr.expires_at < ?
-            """,
-            (now,)
-        )
-        
-        result = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        try:
+            now = utc_now()
+            cursor.execute(
+                """
+                SELECT jr.*, c.title as channel_title
+                FROM join_requests jr
+                JOIN channels c ON jr.bot_id = c.bot_id AND jr.channel_id = c.channel_id
+                WHERE jr.approved_at IS NULL 
+                AND jr.rejected_at IS NULL
+                AND jr.expires_at < ?
+                AND jr.bot_id = ?
+                """,
+                (now, self.bot_id)
+            )
+            
+            result = [dict(row) for row in cursor.fetchall()]
+        finally:
+            self._pool.release(conn)
         
         return result
 
     def get_approval_count(self, channel_id):
         """Get count of approved join requests for a channel."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         cursor = conn.cursor()
         
-        cursor.execute(
-            "SELECT COUNT(*) FROM join_requests WHERE channel_id = ? AND approved_at IS NOT NULL",
-            (channel_id,)
-        )
-        
-        result = cursor.fetchone()[0]
-        conn.close()
+        try:
+            cursor.execute(
+                "SELECT COUNT(*) FROM join_requests WHERE bot_id = ? AND channel_id = ? AND approved_at IS NOT NULL",
+                (self.bot_id, channel_id)
+            )
+            
+            result = cursor.fetchone()[0]
+        finally:
+            self._pool.release(conn)
         
         return result
         
     def get_pending_request(self, channel_id, user_id):
         """Get a pending join request if it exists."""
-        conn = sqlite3.connect(self.db_path)
+        conn = self._pool.acquire()
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
         
-        cursor.execute(
-            """
-            SELECT * FROM join_requests 
-            WHERE channel_id = ? AND user_id = ? 
-            AND approved_at IS NULL 
-            AND rejected_at IS NULL
-            ORDER BY requested_at DESC
-            LIMIT 1
-            """,
-            (channel_id, user_id)
-        )
+        try:
+            cursor.execute(
+                """
+                SELECT * FROM join_requests 
+                WHERE bot_id = ? AND channel_id = ? AND user_id = ? 
+                AND approved_at IS NULL 
+                AND rejected_at IS NULL
+                ORDER BY requested_at DESC, id DESC
+                LIMIT 1
+                """,
+                (self.bot_id, channel_id, user_id)
+            )
+            
+            result = cursor.fetchone()
+        finally:
+            self._pool.release(conn)
         
-        result = cursor.fetchone()
-        conn.close()
+        return dict(result) if result else None
+
+    def defer_update(self, kind, payload):
+        """Store a serialized update so it can be replayed later."""
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "INSERT INTO deferred_updates (bot_id, kind, payload) VALUES (?, ?, ?)",
+                (self.bot_id, kind, payload)
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            return False
+        finally:
+            self._pool.release(conn)
+
+    def get_deferred_updates(self, kind, limit):
+        """Get the oldest deferred updates of a kind."""
+        conn = self._pool.acquire()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "SELECT * FROM deferred_updates WHERE bot_id = ? AND kind = ? ORDER BY id LIMIT ?",
+                (self.bot_id, kind, limit)
+            )
+            
+            result = [dict(row) for row in cursor.fetchall()]
+        finally:
+            self._pool.release(conn)
+        
+        return result
+
+    def delete_deferred_update(self, update_id):
+        """Remove a deferred update once it has been replayed."""
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "DELETE FROM deferred_updates WHERE id = ?",
+                (update_id,)
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            return False
+        finally:
+            self._pool.release(conn)
+
+    def get_deferred_count(self):
+        """Get the number of updates waiting in the durable queue."""
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("SELECT COUNT(*) FROM deferred_updates WHERE bot_id = ?", (self.bot_id,))
+            
+            result = cursor.fetchone()[0]
+        finally:
+            self._pool.release(conn)
+        
+        return result
+
+    def count_approved_members(self, channel_id):
+        """Get the number of distinct users approved into a channel."""
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                """
+                SELECT COUNT(DISTINCT user_id) FROM join_requests
+                WHERE bot_id = ? AND channel_id = ? AND approved_at IS NOT NULL
+                """,
+                (self.bot_id, channel_id)
+            )
+            
+            result = cursor.fetchone()[0]
+        finally:
+            self._pool.release(conn)
+        
+        return result
+
+    def create_broadcast_job(self, channel_id, admin_chat_id, text):
+        """Create a broadcast job to a channel's approved members and return its id."""
+        total = self.count_approved_members(channel_id)
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                """
+                INSERT INTO broadcast_jobs (bot_id, channel_id, admin_chat_id, text, total)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (self.bot_id, channel_id, admin_chat_id, text, total)
+            )
+            conn.commit()
+            return cursor.lastrowid
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            return None
+        finally:
+            self._pool.release(conn)
+
+    def get_broadcast_job(self, job_id):
+        """Get a broadcast job."""
+        conn = self._pool.acquire()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "SELECT * FROM broadcast_jobs WHERE bot_id = ? AND id = ?",
+                (self.bot_id, job_id)
+            )
+            result = cursor.fetchone()
+        finally:
+            self._pool.release(conn)
         
         return dict(result) if result else None
+
+    def get_broadcast_jobs(self, status=None, limit=5):
+        """Get the most recent broadcast jobs, optionally only those with a status."""
+        conn = self._pool.acquire()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        try:
+            if status:
+                cursor.execute(
+                    "SELECT * FROM broadcast_jobs WHERE bot_id = ? AND status = ? ORDER BY id DESC LIMIT ?",
+                    (self.bot_id, status, limit)
+                )
+            else:
+                cursor.execute(
+                    "SELECT * FROM broadcast_jobs WHERE bot_id = ? ORDER BY id DESC LIMIT ?",
+                    (self.bot_id, limit)
+                )
+            
+            result = [dict(row) for row in cursor.fetchall()]
+        finally:
+            self._pool.release(conn)
+        
+        return result
+
+    def claim_broadcast_page(self, job_id, channel_id, after_user_id, limit):
+        """Queue the next page of recipients for a job and advance its cursor.
+
+        Recipients are read by keyset pagination on user_id, so each page is
+        an index range scan no matter how far into the channel the job is.
+        """
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                """
+                SELECT DISTINCT user_id FROM join_requests
+                WHERE bot_id = ? AND channel_id = ? AND approved_at IS NOT NULL
+                AND user_id > ?
+                ORDER BY user_id
+                LIMIT ?
+                """,
+                (self.bot_id, channel_id, after_user_id, limit)
+            )
+            user_ids = [row[0] for row in cursor.fetchall()]
+            
+            if user_ids:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO broadcast_deliveries (job_id, user_id) VALUES (?, ?)",
+                    [(job_id, user_id) for user_id in user_ids]
+                )
+                cursor.execute(
+                    "UPDATE broadcast_jobs SET cursor_user_id = ? WHERE id = ?",
+                    (user_ids[-1], job_id)
+                )
+                conn.commit()
+            return user_ids
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            raise
+        finally:
+            self._pool.release(conn)
+
+    def get_pending_deliveries(self, job_id, after_user_id, limit):
+        """Get queued recipients of a job that have not been attempted yet."""
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                """
+                SELECT user_id FROM broadcast_deliveries
+                WHERE job_id = ? AND status = 'pending' AND user_id > ?
+                ORDER BY user_id
+                LIMIT ?
+                """,
+                (job_id, after_user_id, limit)
+            )
+            
+            result = [row[0] for row in cursor.fetchall()]
+        finally:
+            self._pool.release(conn)
+        
+        return result
+
+    def record_delivery(self, job_id, user_id, status, error=None):
+        """Record the outcome of sending a broadcast to one recipient."""
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                """
+                UPDATE broadcast_deliveries
+                SET status = ?, error = ?, attempted_at = ?
+                WHERE job_id = ? AND user_id = ? AND status = 'pending'
+                """,
+                (status, error, utc_now(), job_id, user_id)
+            )
+            if cursor.rowcount > 0:
+                counter = "sent" if status == "sent" else "failed"
+                cursor.execute(
+                    f"UPDATE broadcast_jobs SET {counter} = {counter} + 1 WHERE id = ?",
+                    (job_id,)
+                )
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            return False
+        finally:
+            self._pool.release(conn)
+
+    def finish_broadcast_job(self, job_id, status="done"):
+        """Mark a broadcast job as finished."""
+        conn = self._pool.acquire()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute(
+                "UPDATE broadcast_jobs SET status = ?, finished_at = ? WHERE bot_id = ? AND id = ?",
+                (status, utc_now(), self.bot_id, job_id)
+            )
+            conn.commit()
+            return True
+        except Exception as e:
+            logging.error(f"Database error: {e}")
+            conn.rollback()
+            return False
+        finally:
+            self._pool.release(conn)
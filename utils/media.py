@@ -0,0 +1,127 @@
+import logging
+import os
+from collections import namedtuple
+
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+# Bot method used to send each supported media type
+SEND_METHODS = {
+    "photo": "send_photo",
+    "video": "send_video",
+    "animation": "send_animation",
+}
+
+# File extensions used to guess the media type of a URL
+EXTENSION_TYPES = {
+    ".jpg": "photo",
+    ".jpeg": "photo",
+    ".png": "photo",
+    ".webp": "photo",
+    ".gif": "animation",
+    ".mp4": "video",
+    ".mov": "video",
+    ".webm": "video",
+}
+
+# Telegram's limit for media captions
+CAPTION_LIMIT = 1024
+
+MediaDescriptor = namedtuple("MediaDescriptor", ["media_type", "source", "file_id"])
+
+
+def guess_media_type(source):
+    """Guess whether a URL or path points to a photo, video or animation."""
+    extension = os.path.splitext(source.split("?")[0])[1].lower()
+    return EXTENSION_TYPES.get(extension, "photo")
+
+
+def message_file_id(message, media_type):
+    """Get the file_id of the media attached to a sent message."""
+    attachment = getattr(message, media_type)
+    if media_type == "photo":
+        attachment = attachment[-1]  # Largest size
+    return attachment.file_id
+
+
+class MediaSender:
+    def __init__(self, db, breaker, media_dir):
+        """Send channel templates with their media, reusing uploaded file_ids."""
+        self.db = db
+        self.breaker = breaker
+        self.media_dir = media_dir
+        self._descriptors = {}  # channel_id -> {kind: MediaDescriptor or None}
+
+    def get_descriptor(self, channel_info, kind):
+        """Get the cached media descriptor for a channel template."""
+        descriptors = self._descriptors.setdefault(channel_info['channel_id'], {})
+        if kind not in descriptors:
+            media_type = channel_info.get(f"{kind}_media_type")
+            descriptors[kind] = MediaDescriptor(
+                media_type,
+                channel_info.get(f"{kind}_media_source"),
+                channel_info.get(f"{kind}_media_file_id"),
+            ) if media_type else None
+        return descriptors[kind]
+
+    def invalidate(self, channel_id):
+        """Forget cached descriptors after a channel's media changes."""
+        self._descriptors.pop(channel_id, None)
+
+    def local_path(self, channel_id, kind, extension):
+        """Where to keep the local copy of a channel's template media."""
+        return os.path.join(self.media_dir, str(self.db.bot_id), f"{channel_id}_{kind}{extension}")
+
+    async def send(self, bot, chat_id, channel_info, kind, text, reply_markup=None):
+        """Send a channel template, attaching its media if one is set.
+
+        If the media can't be sent or re-uploaded, the text goes out on its own.
+        """
+        channel_id = channel_info['channel_id']
+        descriptor = self.get_descriptor(channel_info, kind)
+        if descriptor is not None:
+            try:
+                # Captions are limited, so long texts follow the media as a message
+                if len(text) <= CAPTION_LIMIT:
+                    return await self._send_media(bot, chat_id, channel_id, kind, descriptor,
+                                                  caption=text, reply_markup=reply_markup)
+                await self._send_media(bot, chat_id, channel_id, kind, descriptor)
+            except (BadRequest, OSError) as e:
+                logger.warning(f"Could not send the {kind} media for channel {channel_id}: {e}")
+                message = await self.breaker.call(
+                    bot.send_message, chat_id=chat_id, text=text, reply_markup=reply_markup
+                )
+                # The text went through, so the media is at fault; stop retrying it
+                # until the bot restarts or an admin sets it again
+                self._descriptors.setdefault(channel_id, {})[kind] = None
+                return message
+        
+        return await self.breaker.call(
+            bot.send_message, chat_id=chat_id, text=text, reply_markup=reply_markup
+        )
+
+    async def _send_media(self, bot, chat_id, channel_id, kind, descriptor, **kwargs):
+        send = getattr(bot, SEND_METHODS[descriptor.media_type])
+
+        if descriptor.file_id:
+            try:
+                return await self.breaker.call(send, chat_id, descriptor.file_id, **kwargs)
+            except BadRequest as e:
+                if "file" not in str(e).lower() or not descriptor.source:
+                    raise
+                logger.warning(f"Stored file_id for channel {channel_id} was rejected ({e}), re-uploading")
+
+        message = await self._upload(send, chat_id, descriptor.source, **kwargs)
+
+        # Reuse the new file_id for every later send
+        file_id = message_file_id(message, descriptor.media_type)
+        self.db.set_media_file_id(channel_id, kind, file_id)
+        self._descriptors.setdefault(channel_id, {})[kind] = descriptor._replace(file_id=file_id)
+        return message
+
+    async def _upload(self, send, chat_id, source, **kwargs):
+        if source.startswith(("http://", "https://")):
+            return await self.breaker.call(send, chat_id, source, **kwargs)
+        with open(source, "rb") as media_file:
+            return await self.breaker.call(send, chat_id, media_file, **kwargs)
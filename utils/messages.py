@@ -1,5 +1,5 @@
 import config
-from datetime import datetime
+from utils.database import utc_now
 
 class Messages:
     def __init__(self, db):
@@ -34,25 +34,21 @@ class Messages:
         # Add remaining time information if available
         pending_request = self.db.get_pending_request(channel_info.get('channel_id'), user.id)
         if pending_request and pending_request.get('expires_at'):
-            try:
-                expires_at = datetime.fromisoformat(pending_request['expires_at'])
-                now = datetime.now()
-                if expires_at > now:
-                    time_remaining = expires_at - now
-                    hours = time_remaining.seconds // 3600
-                    minutes = (time_remaining.seconds % 3600) // 60
+            time_remaining = pending_request['expires_at'] - utc_now()
+            if time_remaining > 0:
+                days, seconds = divmod(time_remaining, 86400)
+                hours = seconds // 3600
+                minutes = (seconds % 3600) // 60
+                
+                time_info = f"\n\n⏰ Your request will expire in "
+                if days > 0:
+                    time_info += f"{days} days, "
+                if hours > 0:
+                    time_info += f"{hours} hours "
+                if minutes > 0 and days == 0:  # Only show minutes if less than a day
+                    time_info += f"and {minutes} minutes"
                     
-                    time_info = f"\n\n⏰ Your request will expire in "
-                    if time_remaining.days > 0:
-                        time_info += f"{time_remaining.days} days, "
-                    if hours > 0:
-                        time_info += f"{hours} hours "
-                    if minutes > 0 and time_remaining.days == 0:  # Only show minutes if less than a day
-                        time_info += f"and {minutes} minutes"
-                        
-                    formatted_message += time_info
-            except (ValueError, TypeError):
-                pass  # If there's an error parsing the date, just skip the time remaining info
+                formatted_message += time_info
                 
         return formatted_message
         